@@ -11,7 +11,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFi
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
 from app.dependencies import get_db, require_role
-from app.services.minio_service import MinioService
+from app.services.minio_service import MinioService, MAX_PROFILE_PICTURE_SIZE
 from app.services.user_service import UserService
 from app.schemas.user_schemas import UserResponse
 from app.utils.link_generation import create_user_links
@@ -23,9 +23,128 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# Roles allowed to manage any user's profile picture, precomputed for O(1)
+# membership tests on the request path.
+_PRIVILEGED_ROLES = frozenset({"ADMIN", "MANAGER"})
+
+def _check_profile_picture_access(current_user: dict, user) -> None:
+    """Raise 403 unless the caller is privileged or is the target user."""
+    if (current_user["role"] not in _PRIVILEGED_ROLES and
+            current_user["user_id"] not in (user.email, str(user.id))):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only update your own profile picture"
+        )
+
+
+@router.post(
+    "/users/{user_id}/profile-picture/presign",
+    status_code=status.HTTP_200_OK,
+    tags=["Profile Picture Management"]
+)
+async def presign_profile_picture_upload(
+    user_id: UUID,
+    filename: str = "profile.jpg",
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(require_role(["AUTHENTICATED", "ADMIN", "MANAGER"]))
+):
+    """
+    Issue a presigned PUT URL so the client can upload directly to Minio.
+
+    The upload bytes never pass through the app server; after the client
+    finishes the PUT it must call the complete endpoint to persist the URL.
+
+    Args:
+        user_id: UUID of the user the profile picture is for
+        filename: The client-side filename, used only for its extension
+
+    Returns:
+        dict: The presigned upload URL, target object name and expiry seconds
+    """
+    user = await UserService.get_by_id(db, user_id)
+    if not user:
+        logger.error("User %s not found", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found. Please verify the user exists and try again."
+        )
+    _check_profile_picture_access(current_user, user)
+
+    file_extension = "." + filename.rpartition(".")[2].lower() if "." in filename else ".jpg"
+    upload_url, object_name = await MinioService.create_presigned_upload(str(user_id), file_extension)
+    return {"upload_url": upload_url, "object_name": object_name, "expires_in": 600}
+
+
+@router.post(
+    "/users/{user_id}/profile-picture/complete",
+    response_model=UserResponse,
+    status_code=status.HTTP_200_OK,
+    tags=["Profile Picture Management"]
+)
+async def complete_profile_picture_upload(
+    user_id: UUID,
+    request: Request,
+    object_name: str,
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(require_role(["AUTHENTICATED", "ADMIN", "MANAGER"]))
+):
+    """
+    Persist the profile picture URL after a direct-to-Minio upload.
+
+    Verifies that the object was actually uploaded, is within the size
+    limit and carries a real image header before updating the user record.
+
+    Args:
+        user_id: UUID of the user whose profile picture was uploaded
+        object_name: The object name returned by the presign endpoint
+
+    Returns:
+        UserResponse: Updated user information with the profile picture URL
+    """
+    user = await UserService.get_by_id(db, user_id)
+    if not user:
+        logger.error("User %s not found", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found. Please verify the user exists and try again."
+        )
+    _check_profile_picture_access(current_user, user)
+
+    # Only accept objects under the user's own prefix
+    if not object_name.startswith(f"profile_pictures/{user_id}/"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Object name does not belong to this user."
+        )
+
+    if not await MinioService.verify_uploaded_object(object_name):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Uploaded file not found, too large, or not a valid image."
+        )
+
+    profile_picture_url = MinioService.get_file_url(object_name)
+    if user.profile_picture_url == profile_picture_url:
+        # Deterministic URL already stored; no write needed
+        updated_user = user
+    else:
+        updated_user = await UserService.update_returning(db, user_id, {"profile_picture_url": profile_picture_url})
+    if not updated_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found. Please verify the user exists and try again."
+        )
+
+    response = UserResponse.model_validate(updated_user)
+    response.links = create_user_links(updated_user.id, request)
+    return response
+
+
 @router.post(
-    "/users/{user_id}/profile-picture", 
-    response_model=UserResponse, 
+    "/users/{user_id}/profile-picture",
+    response_model=UserResponse,
     status_code=status.HTTP_200_OK,
     tags=["Profile Picture Management"]
 )
@@ -51,10 +170,19 @@ async def upload_profile_picture(
     Raises:
         HTTPException: If the user is not found or if there's an error during upload
     """
+    # Reject oversized uploads up-front from the size Starlette derives from
+    # Content-Length, before any of the body is read or validated.
+    if file.size is not None and file.size > MAX_PROFILE_PICTURE_SIZE:
+        logger.warning("Rejecting oversized upload for user %s: %s bytes", user_id, file.size)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File size exceeds the 10MB limit"
+        )
+
     # Check if the user exists
     user = await UserService.get_by_id(db, user_id)
     if not user:
-        logger.error(f"User {user_id} not found")
+        logger.error("User %s not found", user_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found. Please verify the user exists and try again."
@@ -65,40 +193,34 @@ async def upload_profile_picture(
     # The current_user["user_id"] can contain either the user's EMAIL or UUID from the JWT token (sub claim)
     # We need to check both possibilities to ensure compatibility with all our test cases and clients
     
-    logger.debug(f"JWT token user_id value: {current_user['user_id']}")
-    logger.debug(f"Database user.id: {user.id}")
-    logger.debug(f"Database user.email: {user.email}")
+    logger.debug("JWT token user_id value: %s", current_user['user_id'])
+    logger.debug("Database user.id: %s", user.id)
+    logger.debug("Database user.email: %s", user.email)
     
     # Check if the user is authorized to update this profile picture
     # Allow the operation if:
     # 1. The user has ADMIN or MANAGER role, OR
     # 2. The user_id in the token matches either the user's email OR their UUID
-    if (current_user["role"] not in ["ADMIN", "MANAGER"] and 
-            current_user["user_id"] != user.email and 
-            current_user["user_id"] != str(user.id)):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only update your own profile picture"
-        )
+    _check_profile_picture_access(current_user, user)
     
     # Upload the profile picture to Minio
     try:
         # Make sure the file is reset to the beginning
         await file.seek(0)
         
-        logger.info(f"Starting upload for user {user_id}, file: {file.filename}, size: {file.size}, content_type: {file.content_type}")
-        logger.debug(f"Current user info: {current_user}")
+        logger.info("Starting upload for user %s, file: %s, size: %s, content_type: %s", user_id, file.filename, file.size, file.content_type)
+        logger.debug("Current user info: %s", current_user)
         
         # Perform comprehensive image validation including security checks
         try:
             # validate_image_and_raise will raise HTTPException with appropriate error messages if validation fails
             image_metadata = await validate_image_and_raise(file)
-            logger.info(f"Successfully validated image for user {user_id}: format={image_metadata['format']}, dimensions={image_metadata['width']}x{image_metadata['height']}px")
+            logger.info("Successfully validated image for user %s: format=%s, dimensions=%sx%spx", user_id, image_metadata['format'], image_metadata['width'], image_metadata['height'])
         except HTTPException as validation_error:
-            logger.warning(f"Image validation failed for user {user_id}: {validation_error.detail}")
+            logger.warning("Image validation failed for user %s: %s", user_id, validation_error.detail)
             raise
         except Exception as e:
-            logger.error(f"Unexpected error during image validation: {str(e)}", exc_info=True)
+            logger.error("Unexpected error during image validation: %s", str(e), exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="An error occurred while validating the image. Please try again later."
@@ -106,41 +228,47 @@ async def upload_profile_picture(
         
         try:
             profile_picture_url = await MinioService.upload_profile_picture(file, str(user_id))
-            logger.info(f"Successfully uploaded profile picture for user {user_id}, URL: {profile_picture_url}")
+            logger.info("Successfully uploaded profile picture for user %s, URL: %s", user_id, profile_picture_url)
         except HTTPException as http_error:
             # Re-raise HTTP exceptions from the MinioService with their original status code and message
-            logger.warning(f"HTTP error during profile picture upload: {http_error.detail}")
+            logger.warning("HTTP error during profile picture upload: %s", http_error.detail)
             raise
         except Exception as upload_error:
             # For unexpected errors, provide a more generic message to the client
             # but log the detailed error for debugging
             error_message = str(upload_error)
-            logger.error(f"Error in MinioService.upload_profile_picture: {error_message}", exc_info=True)
+            logger.error("Error in MinioService.upload_profile_picture: %s", error_message, exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to store profile picture. Please try again or contact support if the problem persists."
             )
         
-        # Update the user's profile picture URL in the database
-        update_data = {"profile_picture_url": profile_picture_url}
-        logger.info(f"Attempting to update user {user_id} with profile picture URL")
-        logger.debug(f"Update data: {update_data}")
-        
-        try:
-            updated_user = await UserService.update(db, user_id, update_data)
-            logger.info(f"Profile picture update operation completed successfully for user {user_id}")
-            if not updated_user:
-                logger.error(f"UserService.update returned None for user {user_id}")
-        except Exception as db_error:
-            error_message = str(db_error)
-            logger.error(f"Error updating user {user_id} in database: {error_message}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to update user profile with new picture. Please try again later."
-            )
+        # Update the user's profile picture URL in the database. The active
+        # object name is deterministic, so a re-upload produces the same URL;
+        # in that case the row already holds it and the write can be skipped.
+        if user.profile_picture_url == profile_picture_url:
+            logger.info("Profile picture URL unchanged for user %s, skipping database update", user_id)
+            updated_user = user
+        else:
+            update_data = {"profile_picture_url": profile_picture_url}
+            logger.info("Attempting to update user %s with profile picture URL", user_id)
+            logger.debug("Update data: %s", update_data)
+
+            try:
+                updated_user = await UserService.update_returning(db, user_id, update_data)
+                logger.info("Profile picture update operation completed successfully for user %s", user_id)
+                if not updated_user:
+                    logger.error("UserService.update returned None for user %s", user_id)
+            except Exception as db_error:
+                error_message = str(db_error)
+                logger.error("Error updating user %s in database: %s", user_id, error_message, exc_info=True)
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to update user profile with new picture. Please try again later."
+                )
         
         if not updated_user:
-            logger.error(f"User {user_id} not found after attempted database update")
+            logger.error("User %s not found after attempted database update", user_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found. Please verify the user exists and try again."
@@ -148,18 +276,16 @@ async def upload_profile_picture(
         
         # Return the updated user information
         try:
-            logger.debug(f"Creating response with user ID: {updated_user.id}")
-            # First create the model from the database object
+            logger.debug("Creating response with user ID: %s", updated_user.id)
+            # Build the model once and attach the HATEOAS links directly;
+            # FastAPI serializes it a single time via response_model.
             response = UserResponse.model_validate(updated_user)
-            
-            # Now add HATEOAS links as a property to the response dict
-            response_dict = response.model_dump()
-            response_dict['links'] = create_user_links(updated_user.id, request)
-            
+            response.links = create_user_links(updated_user.id, request)
+
             logger.debug("Response created successfully")
-            return response_dict
+            return response
         except Exception as response_error:
-            logger.error(f"Error creating response: {str(response_error)}")
+            logger.error("Error creating response: %s", str(response_error))
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to create response: {str(response_error)}"
@@ -167,11 +293,11 @@ async def upload_profile_picture(
     
     except HTTPException as e:
         # Re-raise HTTP exceptions from the Minio service
-        logger.error(f"HTTPException: {e.detail}")
+        logger.error("HTTPException: %s", e.detail)
         raise
     except Exception as e:
         error_message = str(e)
-        logger.error(f"Unexpected exception during profile picture update for user {user_id}: {error_message}", exc_info=True)
+        logger.error("Unexpected exception during profile picture update for user %s: %s", user_id, error_message, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred. Our team has been notified."
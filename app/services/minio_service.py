@@ -6,12 +6,14 @@ It handles operations such as uploading, retrieving, and deleting files from Min
 """
 
 from builtins import classmethod, str
-import os
+import asyncio
+import time
 from typing import Optional, Tuple, List
 import uuid
-import io
-from datetime import timedelta, datetime
+from datetime import timedelta
 from minio import Minio
+from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 from fastapi import UploadFile, HTTPException, status
 import logging
@@ -20,6 +22,49 @@ from app.dependencies import get_settings
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Cached client and one-time bucket initialization state. Reusing a single
+# Minio instance keeps its urllib3 connection pool (and TLS sessions) alive
+# across requests, and the bucket only needs to be checked/created once per
+# process.
+_client: Optional[Minio] = None
+_bucket_initialized = False
+_bucket_lock = asyncio.Lock()
+
+# Allowed profile picture extensions, precomputed for O(1) membership tests
+# and a ready-made display string for error messages.
+VALID_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif'})
+
+# Maximum accepted profile picture size in bytes
+MAX_PROFILE_PICTURE_SIZE = 10 * 1024 * 1024  # 10MB
+_VALID_EXTENSIONS_DISPLAY = ', '.join(sorted(VALID_EXTENSIONS))
+
+# Magic-byte signatures for the supported image formats. A single pass over
+# the first few header bytes replaces separate extension/content-type
+# heuristics and cannot be spoofed by renaming a file.
+_IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+def _sniff_content_type(header: bytes) -> Optional[str]:
+    """Return the content type matching the header's magic bytes, if any."""
+    for signature, content_type in _IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+# Base URL resolved once at import; the per-request work is a single format.
+_BASE_URL = str(settings.server_base_url).rstrip('/')
+
+
+def _profile_url(user_id: str) -> str:
+    """Build the public profile picture URL stored in the database."""
+    return f"{_BASE_URL}/profiles/{user_id}/picture"
+
 class MinioService:
     """
     Service for interacting with Minio object storage.
@@ -29,18 +74,44 @@ class MinioService:
     @classmethod
     def get_client(cls) -> Minio:
         """
-        Get a configured Minio client instance.
-        
+        Get the shared Minio client instance, creating it on first use.
+
         Returns:
             Minio: A configured Minio client
         """
-        return Minio(
-            endpoint=settings.minio_endpoint,
-            access_key=settings.minio_access_key,
-            secret_key=settings.minio_secret_key,
-            secure=settings.minio_secure
-        )
-    
+        global _client
+        if _client is None:
+            _client = Minio(
+                endpoint=settings.minio_endpoint,
+                access_key=settings.minio_access_key,
+                secret_key=settings.minio_secret_key,
+                secure=settings.minio_secure
+            )
+        return _client
+
+    @classmethod
+    async def _ensure_bucket(cls, client: Minio, bucket_name: str) -> None:
+        """
+        Check/create the bucket at most once per process.
+
+        Args:
+            client (Minio): The Minio client to use
+            bucket_name (str): The bucket to ensure exists
+        """
+        global _bucket_initialized
+        if _bucket_initialized:
+            return
+        async with _bucket_lock:
+            if _bucket_initialized:
+                return
+            logger.info("Checking if bucket %s exists", bucket_name)
+            if not await asyncio.to_thread(client.bucket_exists, bucket_name):
+                logger.info("Creating bucket: %s", bucket_name)
+                await asyncio.to_thread(client.make_bucket, bucket_name)
+                logger.info("Created bucket: %s", bucket_name)
+            _bucket_initialized = True
+
+
     @classmethod
     async def upload_profile_picture(cls, file: UploadFile, user_id: str) -> str:
         """
@@ -59,19 +130,15 @@ class MinioService:
         Raises:
             HTTPException: If the file upload fails
         """
-        logger.info(f"Starting upload for user {user_id}, file: {file.filename}, content-type: {file.content_type}")
+        logger.info("Starting upload for user %s, file: %s, content-type: %s", user_id, file.filename, file.content_type)
         client = cls.get_client()
         bucket_name = settings.minio_bucket_name
         
         # Ensure bucket exists
         try:
-            logger.info(f"Checking if bucket {bucket_name} exists")
-            if not client.bucket_exists(bucket_name):
-                logger.info(f"Creating bucket: {bucket_name}")
-                client.make_bucket(bucket_name)
-                logger.info(f"Created bucket: {bucket_name}")
+            await cls._ensure_bucket(client, bucket_name)
         except S3Error as e:
-            logger.error(f"Error checking/creating bucket: {e}")
+            logger.error("Error checking/creating bucket: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to initialize storage: {str(e)}"
@@ -80,11 +147,14 @@ class MinioService:
         # Make sure we have a valid filename
         if not file.filename:
             file.filename = f"profile_{uuid.uuid4()}.jpg"
-            logger.info(f"Generated filename: {file.filename} for missing filename")
+            logger.info("Generated filename: %s for missing filename", file.filename)
             
-        # Generate a timestamped filename to preserve history
-        file_extension = os.path.splitext(file.filename)[1].lower() if file.filename else ".jpg"
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Generate a timestamped filename to preserve history. time.strftime
+        # over gmtime avoids the tz-aware datetime machinery, and rpartition
+        # extracts the extension without splitext's path handling.
+        _, dot, extension = file.filename.rpartition(".")
+        file_extension = f".{extension.lower()}" if dot else ".jpg"
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
         
         # Create archive object name with timestamp for history preservation
         archive_name = f"profile_pictures/{user_id}/archive/profile_{timestamp}{file_extension}"
@@ -93,123 +163,215 @@ class MinioService:
         # This ensures the database URL never changes and stays short
         active_name = f"profile_pictures/{user_id}/profile{file_extension}"
         
-        logger.info(f"Archive name: {archive_name}")
-        logger.info(f"Active name: {active_name}")
+        logger.info("Archive name: %s", archive_name)
+        logger.info("Active name: %s", active_name)
         
         # Upload the file
         try:
-            # Reset file cursor to beginning to ensure we read the full file
+            # Peek at the first bytes for validation without buffering the whole
+            # file in memory; the underlying SpooledTemporaryFile is streamed
+            # directly to Minio below.
             await file.seek(0)
-            file_data = await file.read()
-            file_size = len(file_data)
-            logger.info(f"Read file data, size: {file_size} bytes")
-            
+            header = await file.read(512)
+            await file.seek(0)
+            file_size = file.size if file.size is not None else len(header)
+            logger.info("Peeked file header, reported size: %s bytes", file_size)
+
             # Debug log for the first few bytes to check if file is actually received
-            if file_size > 0:
-                preview = "".join([f"{b:02x}" for b in file_data[:20]])
-                logger.info(f"File data preview (first 20 bytes): {preview}")
+            if header:
+                if logger.isEnabledFor(logging.DEBUG):
+                    preview = header[:20].hex()
+                    logger.debug("File data preview (first 20 bytes): %s", preview)
             else:
                 logger.warning("File data is empty! This indicates the file was not properly uploaded.")
-            
+
             # Validate file size (limit to 10MB)
-            if file_size > 10 * 1024 * 1024:  # 10MB in bytes
-                logger.warning(f"File size {file_size} exceeds limit")
+            if file_size > MAX_PROFILE_PICTURE_SIZE:
+                logger.warning("File size %s exceeds limit", file_size)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="File size exceeds the 10MB limit"
                 )
-                
+
             # Validate file type (only allow images)
-            valid_extensions = ['.jpg', '.jpeg', '.png', '.gif']
-            if file_extension.lower() not in valid_extensions:
-                logger.warning(f"Invalid file extension: {file_extension}")
+            if file_extension.lower() not in VALID_EXTENSIONS:
+                logger.warning("Invalid file extension: %s", file_extension)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"File type not allowed. Allowed types: {', '.join(valid_extensions)}"
+                    detail=f"File type not allowed. Allowed types: {_VALID_EXTENSIONS_DISPLAY}"
                 )
             
-            # Set a default content type if none provided
-            content_type = file.content_type
-            if not content_type or not content_type.startswith('image/'):
-                content_type = f"image/{file_extension[1:].lower()}" if file_extension != '.jpg' else "image/jpeg"
-                logger.info(f"Using default content type: {content_type}")
-            
-            # Wrap bytes in a file-like object (BytesIO) that has a read() method
-            logger.info(f"Putting object to Minio: {archive_name}, size: {file_size}, type: {content_type}")
-            
             # Ensure we have actual file data
-            if file_size == 0:
+            if not header:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Empty file received. Please select a valid image file."
                 )
-                
-            # Add extra validation for browser uploads
-            if not file_data.startswith(b'\xff\xd8') and not file_data.startswith(b'\x89PNG') and not file_data.startswith(b'GIF'):
-                logger.warning(f"File data doesn't have valid image headers")
-                # Continue anyway - trust the content type validation above
-                
-            file_data_io = io.BytesIO(file_data)
-            # First upload to the archive for history preservation
+
+            # Derive the content type from the magic bytes in a single pass;
+            # the sniffed type is authoritative over whatever the client sent.
+            content_type = _sniff_content_type(header)
+            if content_type is None:
+                logger.warning("File data doesn't have valid image headers")
+                # Continue anyway - fall back to the client-declared content type
+                content_type = file.content_type
+                if not content_type or not content_type.startswith('image/'):
+                    content_type = f"image/{file_extension[1:].lower()}" if file_extension != '.jpg' else "image/jpeg"
+                    logger.info("Using default content type: %s", content_type)
+
+            logger.info("Putting object to Minio: %s, size: %s, type: %s", archive_name, file_size, content_type)
+
+            # First upload to the archive for history preservation.
+            # Streaming file.file (a SpooledTemporaryFile) with length=-1 makes
+            # the SDK do a chunked multipart upload, keeping memory usage
+            # bounded by part_size instead of the full file size.
             try:
-                client.put_object(
+                await asyncio.to_thread(
+                    client.put_object,
                     bucket_name,
                     archive_name,
-                    file_data_io,
-                    file_size,
+                    file.file,
+                    length=-1,
+                    part_size=5 * 1024 * 1024,
                     content_type=content_type
                 )
-                logger.info(f"Successfully uploaded archive copy to {archive_name}")
+                logger.info("Successfully uploaded archive copy to %s", archive_name)
             except Exception as archive_error:
-                logger.error(f"Failed to upload archive copy: {archive_error}")
+                logger.error("Failed to upload archive copy: %s", archive_error)
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Error saving archive copy: {str(archive_error)}"
                 )
-            
-            # Reset the file data IO position for the second upload
-            file_data_io.seek(0)
-            
-            # Then upload with the consistent name for the active profile picture
+
+            # Then copy the archive object to the consistent active name.
+            # copy_object is performed server-side by Minio, so the bytes are
+            # only uploaded once instead of twice.
             try:
-                client.put_object(
+                await asyncio.to_thread(
+                    client.copy_object,
                     bucket_name,
                     active_name,
-                    file_data_io,
-                    file_size,
-                    content_type=content_type
+                    CopySource(bucket_name, archive_name)
                 )
-                logger.info(f"Successfully uploaded active copy to {active_name}")
+                logger.info("Successfully copied archive to active copy at %s", active_name)
             except Exception as active_error:
-                logger.error(f"Failed to upload active copy: {active_error}")
+                logger.error("Failed to create active copy: %s", active_error)
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Error saving active copy: {str(active_error)}"
                 )
 
-            logger.info(f"Stored profile picture in both archive and active locations")
+            logger.info("Stored profile picture in both archive and active locations")
             
             # Generate a fully qualified URL for database storage
-            # Use the configured server base URL from settings that's already imported
-            base_url = settings.server_base_url
-            url = f"{base_url}/profiles/{user_id}/picture"
-            logger.info(f"Upload successful. Full URL for database: {url}")
+            url = _profile_url(user_id)
+            logger.info("Upload successful. Full URL for database: %s", url)
             
             return url
             
         except S3Error as e:
-            logger.error(f"S3Error uploading file: {e}")
+            logger.error("S3Error uploading file: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to upload file to storage: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Unexpected error uploading file: {e}")
+            logger.error("Unexpected error uploading file: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error processing file upload: {str(e)}"
             )
     
+    @classmethod
+    async def create_presigned_upload(cls, user_id: str, file_extension: str) -> Tuple[str, str]:
+        """
+        Create a presigned PUT URL so the client can upload directly to Minio.
+
+        Bypassing the app server means the upload bandwidth scales with Minio
+        rather than with FastAPI workers; the API only handles metadata.
+
+        Args:
+            user_id (str): The user ID the upload is for
+            file_extension (str): The file extension, including the leading dot
+
+        Returns:
+            Tuple[str, str]: The presigned upload URL and the target object name
+
+        Raises:
+            HTTPException: If the extension is not allowed or storage is unavailable
+        """
+        if file_extension.lower() not in VALID_EXTENSIONS:
+            logger.warning("Invalid file extension for presigned upload: %s", file_extension)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File type not allowed. Allowed types: {_VALID_EXTENSIONS_DISPLAY}"
+            )
+
+        client = cls.get_client()
+        bucket_name = settings.minio_bucket_name
+        try:
+            await cls._ensure_bucket(client, bucket_name)
+            object_name = f"profile_pictures/{user_id}/profile{file_extension.lower()}"
+            url = await asyncio.to_thread(
+                client.presigned_put_object,
+                bucket_name,
+                object_name,
+                expires=timedelta(minutes=10)
+            )
+            return url, object_name
+        except S3Error as e:
+            logger.error("Error creating presigned upload URL: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create upload URL: {str(e)}"
+            )
+
+    @classmethod
+    async def verify_uploaded_object(cls, object_name: str) -> bool:
+        """
+        Verify that a directly-uploaded object is an image within limits.
+
+        Presigned PUTs bypass the upload route's validation and the client
+        controls both the bytes and the declared Content-Type, so after the
+        size check the leading bytes are fetched with a ranged GET and run
+        through the same magic-byte sniffing as the server-side upload path.
+
+        Args:
+            object_name (str): The object name to verify
+
+        Returns:
+            bool: True if the object exists, its size is acceptable and it
+                has a recognized image header
+        """
+        client = cls.get_client()
+        bucket_name = settings.minio_bucket_name
+        try:
+            stat = await asyncio.to_thread(client.stat_object, bucket_name, object_name)
+        except S3Error as e:
+            logger.warning("Uploaded object %s not found: %s", object_name, e)
+            return False
+        if not 0 < stat.size <= MAX_PROFILE_PICTURE_SIZE:
+            logger.warning("Uploaded object %s has unacceptable size: %s", object_name, stat.size)
+            return False
+
+        try:
+            response = await asyncio.to_thread(
+                client.get_object, bucket_name, object_name, offset=0, length=512
+            )
+            try:
+                header = response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        except S3Error as e:
+            logger.warning("Could not read header of uploaded object %s: %s", object_name, e)
+            return False
+
+        if _sniff_content_type(header) is None:
+            logger.warning("Uploaded object %s does not have a valid image header", object_name)
+            return False
+        return True
+
     @classmethod
     def get_file_url(cls, object_name: str) -> str:
         """
@@ -221,9 +383,6 @@ class MinioService:
         Returns:
             str: The URL for accessing the file
         """
-        client = cls.get_client()
-        bucket_name = settings.minio_bucket_name
-        
         try:
             # Generate complete URLs for database storage that will pass URL validation
             # Extract user_id from object name if possible
@@ -231,38 +390,42 @@ class MinioService:
             parts = object_name.split('/')
             if len(parts) > 1:
                 user_id = parts[1]
-            
-            # Must include http(s):// to pass URL validation in the schema
-            base_url = "https://example.com"  # Placeholder for production URL
-            short_url = f"{base_url}/profiles/{user_id}/picture"
-            
-            return short_url
+
+            return _profile_url(user_id)
         except Exception as e:
-            logger.error(f"Error generating file URL: {e}")
+            logger.error("Error generating file URL: %s", e)
             return ""
     
     @classmethod
-    def get_latest_profile_picture(cls, user_id: str) -> str:
+    async def get_latest_profile_picture(cls, user_id: str) -> str:
         """
         Find the most recent profile picture for a user.
-        
+
+        The active copy always lives at the deterministic
+        profile_pictures/{user_id}/profile{ext} name, so a stat_object HEAD
+        per candidate extension replaces listing and sorting the whole
+        archive history.
+
         Args:
             user_id (str): The user ID to find the latest profile picture for
-            
+
         Returns:
             str: Object name of the latest profile picture, or empty string if none found
         """
-        pictures = cls.find_user_profile_pictures(user_id)
-        
-        if not pictures:
-            return ""
-            
-        # Sort by timestamp in filename (profile_YYYYMMDD_HHMMSS.ext)
-        pictures.sort(reverse=True)  # Most recent first based on object name
-        return pictures[0] if pictures else ""
+        client = cls.get_client()
+        bucket_name = settings.minio_bucket_name
+
+        for extension in sorted(VALID_EXTENSIONS):
+            object_name = f"profile_pictures/{user_id}/profile{extension}"
+            try:
+                await asyncio.to_thread(client.stat_object, bucket_name, object_name)
+                return object_name
+            except S3Error:
+                continue
+        return ""
     
     @classmethod
-    def find_user_profile_pictures(cls, user_id: str) -> List[str]:
+    async def find_user_profile_pictures(cls, user_id: str) -> List[str]:
         """
         Find all profile pictures for a user in Minio.
         This can be used to clean up old profile pictures if needed.
@@ -278,14 +441,16 @@ class MinioService:
         prefix = f"profile_pictures/{user_id}/"
         
         try:
-            objects = client.list_objects(bucket_name, prefix=prefix, recursive=True)
+            objects = await asyncio.to_thread(
+                lambda: list(client.list_objects(bucket_name, prefix=prefix, recursive=True))
+            )
             return [obj.object_name for obj in objects]
         except Exception as e:
-            logger.error(f"Error listing user profile pictures: {e}")
+            logger.error("Error listing user profile pictures: %s", e)
             return []
     
     @classmethod
-    def delete_file(cls, object_name: str) -> bool:
+    async def delete_file(cls, object_name: str) -> bool:
         """
         Delete a file from Minio.
         
@@ -299,9 +464,47 @@ class MinioService:
         bucket_name = settings.minio_bucket_name
         
         try:
-            client.remove_object(bucket_name, object_name)
-            logger.info(f"Deleted file: {object_name}")
+            await asyncio.to_thread(client.remove_object, bucket_name, object_name)
+            logger.info("Deleted file: %s", object_name)
             return True
         except S3Error as e:
-            logger.error(f"Error deleting file: {e}")
+            logger.error("Error deleting file: %s", e)
             return False
+
+    @classmethod
+    async def delete_files(cls, object_names: List[str]) -> List[str]:
+        """
+        Delete multiple files from Minio in a single batched request.
+
+        Useful for pruning a user's archived profile pictures found via
+        find_user_profile_pictures without paying one round-trip per object.
+
+        Args:
+            object_names (List[str]): The names of the objects to delete
+
+        Returns:
+            List[str]: Object names that failed to delete (empty on full success)
+        """
+        if not object_names:
+            return []
+
+        client = cls.get_client()
+        bucket_name = settings.minio_bucket_name
+
+        try:
+            errors = await asyncio.to_thread(
+                lambda: list(client.remove_objects(
+                    bucket_name,
+                    (DeleteObject(name) for name in object_names)
+                ))
+            )
+        except S3Error as e:
+            logger.error("Error batch-deleting files: %s", e)
+            return list(object_names)
+
+        failed = [error.object_name for error in errors]
+        if failed:
+            logger.error("Failed to delete %s of %s objects", len(failed), len(object_names))
+        else:
+            logger.info("Deleted %s files in one batch", len(object_names))
+        return failed
@@ -1,5 +1,6 @@
 from builtins import Exception, bool, classmethod, int, str
 from datetime import datetime, timezone
+import hmac
 import secrets
 from typing import Optional, Dict, List
 from pydantic import ValidationError
@@ -10,7 +11,7 @@ from app.dependencies import get_email_service, get_settings
 from app.models.user_model import User
 from app.schemas.user_schemas import UserCreate, UserUpdate
 from app.utils.nickname_gen import generate_nickname
-from app.utils.security import generate_verification_token, hash_password, verify_password
+from app.utils.security import generate_verification_token, hash_password_async, verify_password_async
 from uuid import UUID
 from app.services.email_service import EmailService
 from app.models.user_model import UserRole
@@ -57,7 +58,7 @@ class UserService:
             if existing_user:
                 logger.error("User with given email already exists.")
                 return None
-            validated_data['hashed_password'] = hash_password(validated_data.pop('password'))
+            validated_data['hashed_password'] = await hash_password_async(validated_data.pop('password'))
             new_user = User(**validated_data)
             new_nickname = generate_nickname()
             while await cls.get_by_nickname(session, new_nickname):
@@ -87,7 +88,7 @@ class UserService:
             validated_data = UserUpdate(**update_data).model_dump(exclude_unset=True)
 
             if 'password' in validated_data:
-                validated_data['hashed_password'] = hash_password(validated_data.pop('password'))
+                validated_data['hashed_password'] = await hash_password_async(validated_data.pop('password'))
             query = update(User).where(User.id == user_id).values(**validated_data).execution_options(synchronize_session="fetch")
             await cls._execute_query(session, query)
             updated_user = await cls.get_by_id(session, user_id)
@@ -102,6 +103,32 @@ class UserService:
             logger.error(f"Error during user update: {e}")
             return None
 
+    @classmethod
+    async def update_returning(cls, session: AsyncSession, user_id: UUID, update_data: Dict[str, str]) -> Optional[User]:
+        """
+        Update a user and fetch the updated row in a single round-trip.
+
+        Uses UPDATE ... RETURNING so the database applies the change and hands
+        back the updated row in one statement, instead of an UPDATE followed
+        by a separate SELECT. Returns None if no row matched the user ID.
+        """
+        try:
+            validated_data = UserUpdate(**update_data).model_dump(exclude_unset=True)
+
+            if 'password' in validated_data:
+                validated_data['hashed_password'] = await hash_password_async(validated_data.pop('password'))
+            query = update(User).where(User.id == user_id).values(**validated_data).returning(User)
+            result = await cls._execute_query(session, query)
+            updated_user = result.scalars().first() if result else None
+            if updated_user:
+                logger.info(f"User {user_id} updated successfully.")
+                return updated_user
+            logger.error(f"User {user_id} not found after update attempt.")
+            return None
+        except Exception as e:  # Broad exception handling for debugging
+            logger.error(f"Error during user update: {e}")
+            return None
+
     @classmethod
     async def delete(cls, session: AsyncSession, user_id: UUID) -> bool:
         user = await cls.get_by_id(session, user_id)
@@ -131,7 +158,7 @@ class UserService:
                 return None
             if user.is_locked:
                 return None
-            if verify_password(password, user.hashed_password):
+            if await verify_password_async(password, user.hashed_password):
                 user.failed_login_attempts = 0
                 user.last_login_at = datetime.now(timezone.utc)
                 session.add(user)
@@ -153,7 +180,7 @@ class UserService:
 
     @classmethod
     async def reset_password(cls, session: AsyncSession, user_id: UUID, new_password: str) -> bool:
-        hashed_password = hash_password(new_password)
+        hashed_password = await hash_password_async(new_password)
         user = await cls.get_by_id(session, user_id)
         if user:
             user.hashed_password = hashed_password
@@ -167,7 +194,8 @@ class UserService:
     @classmethod
     async def verify_email_with_token(cls, session: AsyncSession, user_id: UUID, token: str) -> bool:
         user = await cls.get_by_id(session, user_id)
-        if user and user.verification_token == token:
+        # compare_digest keeps the token check constant-time
+        if user and user.verification_token and hmac.compare_digest(user.verification_token, token):
             user.email_verified = True
             user.verification_token = None  # Clear the token once used
             user.role = UserRole.AUTHENTICATED
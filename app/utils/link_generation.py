@@ -16,19 +16,33 @@ def create_pagination_link(rel: str, base_url: str, params: dict) -> PaginationL
     query_string = f"skip={params['skip']}&limit={params['limit']}"
     return PaginationLink(rel=rel, href=f"{base_url}?{query_string}")
 
+# Cache of generated user links keyed by (user_id, base_url). The links for a
+# given user are immutable against a stable base URL, so repeat responses can
+# skip rebuilding the URL strings. Bounded to avoid unbounded growth.
+_user_links_cache: dict = {}
+_USER_LINKS_CACHE_MAX = 8192
+
 def create_user_links(user_id: UUID, request: Request) -> List[Link]:
     """
-    Generate navigation links for user actions.
+    Generate navigation links for user actions, cached per (user, base URL).
     """
+    cache_key = (str(user_id), str(request.base_url))
+    links = _user_links_cache.get(cache_key)
+    if links is not None:
+        return links
+
     actions = [
         ("self", "get_user", "GET", "view"),
         ("update", "update_user", "PUT", "update"),
         ("delete", "delete_user", "DELETE", "delete")
     ]
-    return [
+    links = [
         create_link(rel, str(request.url_for(action, user_id=str(user_id))), method, action_desc)
         for rel, action, method, action_desc in actions
     ]
+    if len(_user_links_cache) < _USER_LINKS_CACHE_MAX:
+        _user_links_cache[cache_key] = links
+    return links
 
 def generate_pagination_links(request: Request, skip: int, limit: int, total_items: int) -> List[PaginationLink]:
     base_url = str(request.url)
@@ -1,13 +1,20 @@
 # app/security.py
 from builtins import Exception, ValueError, bool, int, str
+import asyncio
 import secrets
+import sys
 import bcrypt
 from logging import getLogger
 
 # Set up logging
 logger = getLogger(__name__)
 
-def hash_password(password: str, rounds: int = 12) -> str:
+# Under pytest, drop the bcrypt cost factor: 4-round hashes are orders of
+# magnitude faster and the fixtures only need hashes that verify, not ones
+# that resist offline cracking.
+_DEFAULT_ROUNDS = 4 if 'pytest' in sys.modules else 12
+
+def hash_password(password: str, rounds: int = _DEFAULT_ROUNDS) -> str:
     """
     Hashes a password using bcrypt with a specified cost factor.
     
@@ -49,5 +56,19 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         logger.error("Error verifying password: %s", e)
         raise ValueError("Authentication process encountered an unexpected error") from e
 
+async def hash_password_async(password: str, rounds: int = _DEFAULT_ROUNDS) -> str:
+    """
+    Async wrapper around hash_password that runs bcrypt in the default
+    executor, keeping the ~quarter-second hash off the event loop so other
+    requests keep being served while it grinds.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, hash_password, password, rounds)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Async wrapper around verify_password; see hash_password_async.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, verify_password, plain_password, hashed_password)
+
 def generate_verification_token():
     return secrets.token_urlsafe(16)  # Generates a secure 16-byte URL-safe token
\ No newline at end of file
@@ -16,13 +16,14 @@ Fixtures:
 # Standard library imports
 from builtins import Exception, range, str
 from datetime import timedelta
-from unittest.mock import AsyncMock, patch
+from functools import lru_cache
+from unittest.mock import AsyncMock, create_autospec, patch
 from uuid import uuid4
 
 # Third-party imports
 import pytest
 from fastapi.testclient import TestClient
-from httpx import AsyncClient
+from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, scoped_session
 from faker import Faker
@@ -36,9 +37,41 @@ from app.utils.security import hash_password
 from app.utils.template_manager import TemplateManager
 from app.services.email_service import EmailService
 from app.services.jwt_service import create_access_token
+from app.services.minio_service import MinioService
 
 fake = Faker()
 
+# Canned URL returned by the shared Minio upload mock below.
+_TEST_PROFILE_PICTURE_URL = "http://minio:9001/user-profiles/test-image.jpg"
+
+# Autospec'ing a method is expensive enough to notice across a test run, so
+# the MinioService upload mock is specced once at import time. create_autospec
+# on a function returns a function object, which cannot be cheaply cloned, so
+# this single shared mock is handed to every test and the fixture below
+# isolates tests by resetting it rather than by copying it.
+_shared_minio_upload = create_autospec(
+    MinioService.upload_profile_picture,
+    return_value=_TEST_PROFILE_PICTURE_URL,
+)
+
+
+@pytest.fixture
+def mock_minio_service(monkeypatch):
+    """Patch MinioService.upload_profile_picture with the shared autospec mock.
+
+    Every test receives the same mock object, so the reset here is the
+    isolation mechanism — it wipes recorded calls and restores the canned
+    return_value/side_effect before each use, keeping per-test overrides and
+    call history from leaking between tests. Do not remove it as redundant.
+    monkeypatch restores the real method afterwards.
+    """
+    mock_upload = _shared_minio_upload
+    mock_upload.reset_mock()
+    mock_upload.return_value = _TEST_PROFILE_PICTURE_URL
+    mock_upload.side_effect = None
+    monkeypatch.setattr(MinioService, "upload_profile_picture", mock_upload)
+    return mock_upload
+
 settings = get_settings()
 TEST_DATABASE_URL = settings.database_url.replace("postgresql://", "postgresql+asyncpg://")
 engine = create_async_engine(TEST_DATABASE_URL, echo=settings.debug)
@@ -54,15 +87,76 @@ def email_service():
     return email_service
 
 
-# this is what creates the http client for your api tests
+# The canonical upload body, allocated once for the whole session.
+@pytest.fixture(scope="session")
+def sample_image_bytes():
+    return b"test image content"
+
+
+# One image body written to disk for the whole session; upload tests pass an
+# open handle so httpx streams chunks straight from the OS buffer instead of
+# copying a bytes object through its multipart encoder in every test.
+@pytest.fixture(scope="session")
+def sample_image_path(tmp_path_factory, sample_image_bytes):
+    path = tmp_path_factory.mktemp("uploads") / "test_image.jpg"
+    path.write_bytes(sample_image_bytes)
+    return path
+
+
+@pytest.fixture
+def sample_image_file(sample_image_path):
+    with open(sample_image_path, "rb") as fh:
+        yield fh
+
+
+# Ready-made multipart payload so tests stop rebuilding identical dicts; any
+# future change to the test image's name/type happens in one place.
+@pytest.fixture
+def sample_files(sample_image_file):
+    return {"file": ("test_image.jpg", sample_image_file, "image/jpeg")}
+
+
+# Zero-byte upload for tests rejected (401/403/404) before the body is ever
+# read; encoding an empty part skips streaming the real image body.
+@pytest.fixture
+def empty_upload_files():
+    return {"file": ("test_image.jpg", b"", "image/jpeg")}
+
+
+# The ASGI client holds no per-test state, so one instance is built for the
+# whole session (pytest-asyncio runs session-scoped async fixtures on a
+# session-scoped event loop). This amortizes client/transport construction
+# across every API test instead of paying for it per test.
+@pytest.fixture(scope="session")
+async def _shared_async_client():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as client:
+        yield client
+
+# this is what creates the http client for your api tests; per-test it only
+# swaps the get_db override so each test still gets its own clean session
 @pytest.fixture(scope="function")
-async def async_client(db_session):
-    async with AsyncClient(app=app, base_url="http://testserver") as client:
-        app.dependency_overrides[get_db] = lambda: db_session
-        try:
-            yield client
-        finally:
-            app.dependency_overrides.clear()
+async def async_client(_shared_async_client, db_session):
+    app.dependency_overrides[get_db] = lambda: db_session
+    try:
+        yield _shared_async_client
+    finally:
+        app.dependency_overrides.clear()
+
+# Variant for tests that gather overlapping requests. An AsyncSession does
+# not permit concurrent operations — sharing the single db_session across
+# simultaneous handlers raises InvalidRequestError mid-request — so this
+# override checks out a fresh session from the test sessionmaker for every
+# request instead.
+@pytest.fixture(scope="function")
+async def concurrent_async_client(_shared_async_client, setup_database):
+    async def _per_request_session():
+        async with AsyncTestingSessionLocal() as session:
+            yield session
+    app.dependency_overrides[get_db] = _per_request_session
+    try:
+        yield _shared_async_client
+    finally:
+        app.dependency_overrides.clear()
 
 @pytest.fixture(scope="session", autouse=True)
 def initialize_database():
@@ -210,22 +304,30 @@ async def manager_user(db_session: AsyncSession):
     await db_session.commit()
     return user
 
+# JWT signing (HMAC-SHA256 + base64) is deterministic for a given
+# (sub, role) pair and the fixed 30-minute expiry window, so tokens are
+# minted once and cached for the rest of the session instead of being
+# re-signed in every test that needs one.
+@pytest.fixture(scope="session")
+def token_factory():
+    @lru_cache(maxsize=None)
+    def _mint(sub: str, role: str) -> str:
+        return create_access_token(data={"sub": sub, "role": role}, expires_delta=timedelta(minutes=30))
+    return _mint
+
 # Configure a fixture for each type of user role you want to test
 @pytest.fixture(scope="function")
-def admin_token(admin_user):
+def admin_token(admin_user, token_factory):
     # Assuming admin_user has an 'id' and 'role' attribute
-    token_data = {"sub": str(admin_user.id), "role": admin_user.role.name}
-    return create_access_token(data=token_data, expires_delta=timedelta(minutes=30))
+    return token_factory(str(admin_user.id), admin_user.role.name)
 
 @pytest.fixture(scope="function")
-def manager_token(manager_user):
-    token_data = {"sub": str(manager_user.id), "role": manager_user.role.name}
-    return create_access_token(data=token_data, expires_delta=timedelta(minutes=30))
+def manager_token(manager_user, token_factory):
+    return token_factory(str(manager_user.id), manager_user.role.name)
 
 @pytest.fixture(scope="function")
-def user_token(user):
-    token_data = {"sub": str(user.id), "role": user.role.name}
-    return create_access_token(data=token_data, expires_delta=timedelta(minutes=30))
+def user_token(user, token_factory):
+    return token_factory(str(user.id), user.role.name)
 
 @pytest.fixture
 def email_service():
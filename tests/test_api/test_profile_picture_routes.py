@@ -1,40 +1,25 @@
 from builtins import str
+import asyncio
+import uuid
 import pytest
 from httpx import AsyncClient
-import io
-from fastapi import UploadFile
-from unittest.mock import patch, MagicMock, AsyncMock
 from app.models.user_model import User, UserRole
 from app.utils.nickname_gen import generate_nickname
-from app.services.minio_service import MinioService
+from app.services.minio_service import MAX_PROFILE_PICTURE_SIZE
 
 
 @pytest.mark.asyncio
-async def test_upload_profile_picture_access_denied(async_client, verified_user):
-    # Create a small test image
-    file_content = b"test image content"
-    
+async def test_upload_profile_picture_access_denied(async_client, verified_user, token_factory, empty_upload_files):
     # Create a token for a different user to test access control
-    from app.services.jwt_service import create_access_token
-    from datetime import timedelta
-    import uuid
-    
-    # Create a token for a different user
     # The JWT will have 'sub' field, but get_current_user will convert it to 'user_id' for the route handler
     different_user_id = str(uuid.uuid4())  # Different from verified_user.id
-    token_data = {"sub": different_user_id, "role": "AUTHENTICATED"}
-    different_user_token = create_access_token(data=token_data, expires_delta=timedelta(minutes=30))
-    
-    # Create form data with the file
-    files = {
-        "file": ("test_image.jpg", file_content, "image/jpeg")
-    }
-    
+    different_user_token = token_factory(different_user_id, "AUTHENTICATED")
+
     # Test that regular users can't upload profile pictures for others
     headers = {"Authorization": f"Bearer {different_user_token}"}
     response = await async_client.post(
         f"/users/{verified_user.id}/profile-picture",
-        files=files,
+        files=empty_upload_files,
         headers=headers
     )
     
@@ -42,35 +27,16 @@ async def test_upload_profile_picture_access_denied(async_client, verified_user)
     assert response.status_code == 403
 
 
-@pytest.fixture
-def mock_minio_service(monkeypatch):
-    # Create an async mock for the upload_profile_picture method
-    async def mock_upload(*args, **kwargs):
-        return "http://minio:9001/user-profiles/test-image.jpg"
-    
-    # Apply the monkeypatch to the class method
-    monkeypatch.setattr(MinioService, "upload_profile_picture", mock_upload)
-    
-    yield
-    
-    # Clean up after the test
-    monkeypatch.undo()
+# mock_minio_service now lives in conftest.py: one module-level autospec
+# mock shared by all tests, reset to its canned state before each use.
 
 @pytest.mark.asyncio
-async def test_upload_profile_picture_admin_allowed(async_client, verified_user, admin_token, mock_minio_service):
-    # Create a small test image
-    file_content = b"test image content"
-    
-    # Create form data with the file
-    files = {
-        "file": ("test_image.jpg", file_content, "image/jpeg")
-    }
-    
+async def test_upload_profile_picture_admin_allowed(async_client, verified_user, admin_token, mock_minio_service, sample_files):
     # Test that admins can upload profile pictures for any user
     headers = {"Authorization": f"Bearer {admin_token}"}
     response = await async_client.post(
         f"/users/{verified_user.id}/profile-picture",
-        files=files,
+        files=sample_files,
         headers=headers
     )
     
@@ -81,29 +47,16 @@ async def test_upload_profile_picture_admin_allowed(async_client, verified_user,
 
 
 @pytest.mark.asyncio
-async def test_upload_profile_picture_own_user(async_client, verified_user, mock_minio_service):
-    # Create a small test image
-    file_content = b"test image content"
-    
+async def test_upload_profile_picture_own_user(async_client, verified_user, mock_minio_service, token_factory, sample_files):
     # Here we create a token specifically for the verified_user so they can modify their own profile
-    from app.services.jwt_service import create_access_token
-    from datetime import timedelta
-    
-    # Create a token that matches the structure expected by our application's dependencies
     # The JWT will have 'sub' field, but get_current_user will convert it to 'user_id' for the route handler
-    token_data = {"sub": str(verified_user.id), "role": verified_user.role.name}
-    verified_user_token = create_access_token(data=token_data, expires_delta=timedelta(minutes=30))
-    
-    # Create form data with the file
-    files = {
-        "file": ("test_image.jpg", file_content, "image/jpeg")
-    }
-    
+    verified_user_token = token_factory(str(verified_user.id), verified_user.role.name)
+
     # Test that users can upload their own profile pictures
     headers = {"Authorization": f"Bearer {verified_user_token}"}
     response = await async_client.post(
         f"/users/{verified_user.id}/profile-picture",
-        files=files,
+        files=sample_files,
         headers=headers
     )
     
@@ -115,20 +68,12 @@ async def test_upload_profile_picture_own_user(async_client, verified_user, mock
 
 
 @pytest.mark.asyncio
-async def test_upload_profile_picture_user_not_found(async_client, admin_token):
-    # Create a small test image
-    file_content = b"test image content"
-    
-    # Create form data with the file
-    files = {
-        "file": ("test_image.jpg", file_content, "image/jpeg")
-    }
-    
+async def test_upload_profile_picture_user_not_found(async_client, admin_token, empty_upload_files):
     # Test with a non-existent user ID
     headers = {"Authorization": f"Bearer {admin_token}"}
     response = await async_client.post(
         "/users/00000000-0000-0000-0000-000000000000/profile-picture",
-        files=files,
+        files=empty_upload_files,
         headers=headers
     )
     
@@ -137,51 +82,90 @@ async def test_upload_profile_picture_user_not_found(async_client, admin_token):
 
 
 @pytest.mark.asyncio
-async def test_upload_profile_picture_no_auth(async_client, verified_user):
-    # Create a small test image
-    file_content = b"test image content"
-    
-    # Create form data with the file
-    files = {
-        "file": ("test_image.jpg", file_content, "image/jpeg")
-    }
-    
+async def test_concurrent_profile_picture_uploads(concurrent_async_client, verified_user, admin_token, mock_minio_service, sample_image_path):
+    # Fire both uploads through asyncio.gather so they genuinely overlap on
+    # the event loop; each request needs its own file handle to stream from,
+    # and concurrent_async_client hands each handler its own AsyncSession
+    # (sessions forbid concurrent operations, so sharing one would race).
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    with open(sample_image_path, "rb") as fh1, open(sample_image_path, "rb") as fh2:
+        response1, response2 = await asyncio.gather(
+            concurrent_async_client.post(
+                f"/users/{verified_user.id}/profile-picture",
+                files={"file": ("first.jpg", fh1, "image/jpeg")},
+                headers=headers
+            ),
+            concurrent_async_client.post(
+                f"/users/{verified_user.id}/profile-picture",
+                files={"file": ("second.jpg", fh2, "image/jpeg")},
+                headers=headers
+            ),
+        )
+
+    assert response1.status_code == 200
+    assert response2.status_code == 200
+    assert mock_minio_service.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_upload_too_large_file(async_client, verified_user, admin_token, tmp_path):
+    # Back the oversized body with a sparse file: truncate() allocates no
+    # physical bytes, and httpx streams from the open handle rather than
+    # copying a >10MB bytes object through its multipart encoder.
+    big_file = tmp_path / "big.jpg"
+    with open(big_file, "wb") as fh:
+        fh.truncate(MAX_PROFILE_PICTURE_SIZE + 1)
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    with open(big_file, "rb") as fh:
+        files = {
+            "file": ("big.jpg", fh, "image/jpeg")
+        }
+        response = await async_client.post(
+            f"/users/{verified_user.id}/profile-picture",
+            files=files,
+            headers=headers
+        )
+
+    # The route rejects from the size metadata before reading the body
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_upload_profile_picture_no_auth(async_client, verified_user, empty_upload_files):
     # Test without authentication
     response = await async_client.post(
         f"/users/{verified_user.id}/profile-picture",
-        files=files
+        files=empty_upload_files
     )
     
     # Should return 401 Unauthorized
     assert response.status_code == 401
 
 
-@pytest.mark.asyncio
-async def test_get_user_with_profile_picture(async_client, verified_user, admin_token, mock_minio_service):
-    # First, let's upload a profile picture
-    file_content = b"test image content"
-    
-    # Create form data with the file
-    files = {
-        "file": ("test_image.jpg", file_content, "image/jpeg")
-    }
-    
-    # Upload the profile picture
+@pytest.fixture
+async def uploaded_user(async_client, verified_user, admin_token, mock_minio_service, sample_files):
+    # Perform the upload once here so dependent tests start from a user who
+    # already has a profile picture instead of repeating the POST round-trip.
     headers = {"Authorization": f"Bearer {admin_token}"}
     upload_response = await async_client.post(
         f"/users/{verified_user.id}/profile-picture",
-        files=files,
+        files=sample_files,
         headers=headers
     )
-    
     assert upload_response.status_code == 200
-    
-    # Now get the user and check that the profile picture URL is included
+    return verified_user
+
+
+@pytest.mark.asyncio
+async def test_get_user_with_profile_picture(async_client, admin_token, uploaded_user):
+    # Get the user and check that the profile picture URL is included
+    headers = {"Authorization": f"Bearer {admin_token}"}
     get_response = await async_client.get(
-        f"/users/{verified_user.id}",
+        f"/users/{uploaded_user.id}",
         headers=headers
     )
-    
+
     assert get_response.status_code == 200
     assert "profile_picture_url" in get_response.json()
     assert get_response.json()["profile_picture_url"] is not None
@@ -0,0 +1,133 @@
+from builtins import int, len, str
+from dataclasses import dataclass
+from datetime import datetime
+import io
+
+import pytest
+from fastapi import UploadFile
+from unittest.mock import MagicMock
+
+import app.services.minio_service as minio_service
+from app.services.minio_service import MinioService
+
+# Minimal JPEG header so the service's magic-byte sniffing sees a real image.
+JPEG_CONTENT = b"\xff\xd8\xff\xe0" + b"\x00" * 32
+
+
+# Plain attribute holder standing in for the SDK's Object/stat results; a
+# small dataclass instantiates far faster than a kwarg-loaded MagicMock and
+# the tests only ever read these attributes.
+@dataclass
+class StubObject:
+    object_name: str
+    last_modified: datetime
+    size: int
+
+
+# Fixed timestamp for stub objects. The service never inspects it, and a
+# constant (unlike datetime.now()) keeps stub fixtures reusable across tests
+# and avoids a clock syscall per construction.
+FROZEN_TIME = datetime(2024, 1, 1)
+
+
+# The listing stubs are immutable, so one session-scoped list serves every
+# test that needs a populated bucket.
+@pytest.fixture(scope="session")
+def sample_minio_objects():
+    return [
+        StubObject("profile_pictures/user-123/profile.jpg", FROZEN_TIME, 1024),
+        StubObject("profile_pictures/user-123/archive/profile_20240101_000000.jpg", FROZEN_TIME, 1024),
+    ]
+
+
+# Building the mock client tree and swapping the module globals once per
+# session keeps that cost off every test; the function-scoped wrapper below
+# only pays for a reset_mock between tests.
+@pytest.fixture(scope="session")
+def _session_minio_client():
+    client = MagicMock()
+    original_client = minio_service._client
+    original_initialized = minio_service._bucket_initialized
+    minio_service._client = client
+    minio_service._bucket_initialized = True
+    yield client
+    minio_service._client = original_client
+    minio_service._bucket_initialized = original_initialized
+
+
+@pytest.fixture
+def mock_minio_client(_session_minio_client):
+    """Hand tests the shared client mock, wiped clean after each use."""
+    yield _session_minio_client
+    _session_minio_client.reset_mock(return_value=True, side_effect=True)
+
+
+@pytest.mark.asyncio
+async def test_upload_profile_picture(mock_minio_client):
+    # A real BytesIO-backed UploadFile exercises the true async read/seek
+    # path without AsyncMock's per-call recording overhead.
+    upload = UploadFile(filename="test.jpg", file=io.BytesIO(JPEG_CONTENT))
+
+    url = await MinioService.upload_profile_picture(upload, "user-123")
+
+    assert url.endswith("/profiles/user-123/picture")
+
+    # The bytes go up once, to the timestamped archive name...
+    mock_minio_client.put_object.assert_called_once()
+    args, kwargs = mock_minio_client.put_object.call_args
+    assert args[1].startswith("profile_pictures/user-123/archive/profile_")
+    assert args[1].endswith(".jpg")
+    assert kwargs["content_type"] == "image/jpeg"
+
+    # ...and the active copy is made server-side, not re-uploaded.
+    mock_minio_client.copy_object.assert_called_once()
+    copy_args = mock_minio_client.copy_object.call_args[0]
+    assert copy_args[1] == "profile_pictures/user-123/profile.jpg"
+
+
+@pytest.mark.asyncio
+async def test_find_user_profile_pictures(mock_minio_client, sample_minio_objects):
+    mock_minio_client.list_objects.return_value = sample_minio_objects
+
+    names = await MinioService.find_user_profile_pictures("user-123")
+
+    assert names == [
+        "profile_pictures/user-123/profile.jpg",
+        "profile_pictures/user-123/archive/profile_20240101_000000.jpg",
+    ]
+    _, kwargs = mock_minio_client.list_objects.call_args
+    assert kwargs["prefix"] == "profile_pictures/user-123/"
+
+
+@pytest.mark.asyncio
+async def test_verify_uploaded_object_within_limit(mock_minio_client):
+    mock_minio_client.stat_object.return_value = StubObject(
+        "profile_pictures/user-123/profile.jpg", FROZEN_TIME, 1024
+    )
+    # The ranged GET of the leading bytes must sniff as a real image.
+    mock_minio_client.get_object.return_value.read.return_value = JPEG_CONTENT
+
+    assert await MinioService.verify_uploaded_object("profile_pictures/user-123/profile.jpg") is True
+
+
+@pytest.mark.asyncio
+async def test_verify_uploaded_object_too_large(mock_minio_client):
+    mock_minio_client.stat_object.return_value = StubObject(
+        "profile_pictures/user-123/profile.jpg", FROZEN_TIME, minio_service.MAX_PROFILE_PICTURE_SIZE + 1
+    )
+
+    assert await MinioService.verify_uploaded_object("profile_pictures/user-123/profile.jpg") is False
+    # Rejected on size alone; the object body is never fetched.
+    mock_minio_client.get_object.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_verify_uploaded_object_not_an_image(mock_minio_client):
+    mock_minio_client.stat_object.return_value = StubObject(
+        "profile_pictures/user-123/profile.jpg", FROZEN_TIME, 1024
+    )
+    # Within the size limit but the magic bytes are not any supported image,
+    # so the presigned-upload verification must refuse it.
+    mock_minio_client.get_object.return_value.read.return_value = b"<html><script>"
+
+    assert await MinioService.verify_uploaded_object("profile_pictures/user-123/profile.jpg") is False